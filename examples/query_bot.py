@@ -7,7 +7,7 @@ import os
 # Add parent directory to path so we can import from src
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.chatbot import NepaliLawBot
+from src.client import load_bot
 from src.utils import print_colored
 
 
@@ -16,7 +16,7 @@ def main():
     
     # Initialize bot
     print_colored("\n🏛️  Initializing Nepali Law Bot...", "cyan")
-    bot = NepaliLawBot()
+    bot = load_bot()
     print_colored("✓ Bot initialized successfully!\n", "green")
     
     # Example queries
@@ -7,8 +7,8 @@ import os
 # Add parent directory to path so we can import from src
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.chatbot import NepaliLawBot
-from src.utils import print_colored, format_confidence
+from src.client import load_bot
+from src.utils import print_colored, format_confidence, ColorBuffer
 
 
 def test_confidence_scoring():
@@ -20,7 +20,7 @@ def test_confidence_scoring():
     
     # Initialize bot
     print_colored("Initializing bot...", "yellow")
-    bot = NepaliLawBot()
+    bot = load_bot()
     print_colored("✓ Bot initialized\n", "green")
     
     # Test cases with expected confidence levels
@@ -50,28 +50,20 @@ def test_confidence_scoring():
     results = []
     
     for i, test in enumerate(test_cases, 1):
-        print_colored(f"\n{'='*80}", "yellow")
-        print_colored(f"TEST CASE {i}/{len(test_cases)}", "yellow")
-        print_colored(f"{'='*80}", "yellow")
-        
-        print(f"\nQuery: {test['query']}")
-        print(f"Expected: {test['expected'].upper()} confidence")
-        print(f"Description: {test['description']}\n")
+        with ColorBuffer() as out:
+            out.print_colored(f"\n{'='*80}", "yellow")
+            out.print_colored(f"TEST CASE {i}/{len(test_cases)}", "yellow")
+            out.print_colored(f"{'='*80}", "yellow")
+            
+            out.print(f"\nQuery: {test['query']}")
+            out.print(f"Expected: {test['expected'].upper()} confidence")
+            out.print(f"Description: {test['description']}\n")
+            
+            out.print_colored("Processing...", "cyan")
         
         # Process query
-        print_colored("Processing...", "cyan")
         response = bot.query(test['query'])
         
-        # Display confidence
-        print(f"\nActual Confidence: {format_confidence(response.confidence_score)}")
-        
-        # Show warning if present
-        if response.warning:
-            print_colored(f"\n⚠️  Warning: {response.warning}", "red")
-        
-        # Show number of sources
-        print(f"\nSources Retrieved: {len(response.sources)}")
-        
         # Categorize result
         score = response.confidence_score
         if score >= 0.7:
@@ -84,7 +76,21 @@ def test_confidence_scoring():
             category = "LOW"
             color = "red"
         
-        print_colored(f"\nCategory: {category}", color)
+        with ColorBuffer() as out:
+            # Display confidence
+            out.print(f"\nActual Confidence: {format_confidence(score)}")
+            
+            # Show warning if present
+            if response.warning:
+                out.print_colored(f"\n⚠️  Warning: {response.warning}", "red")
+            
+            # Show number of sources
+            out.print(f"\nSources Retrieved: {len(response.sources)}")
+            
+            out.print_colored(f"\nCategory: {category}", color)
+            
+            # Brief answer preview
+            out.print(f"\nAnswer Preview: {response.answer[:200]}...")
         
         # Store result
         results.append({
@@ -95,9 +101,6 @@ def test_confidence_scoring():
             "sources": len(response.sources)
         })
         
-        # Brief answer preview
-        print(f"\nAnswer Preview: {response.answer[:200]}...")
-        
         if i < len(test_cases):
             input("\n\nPress Enter for next test case...")
     
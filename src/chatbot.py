@@ -5,19 +5,32 @@ Integrates retrieval, LLM generation, and output parsing
 # Suppress verbose logging first
 from . import suppress_logs
 
-from typing import Optional
-from langdetect import detect, LangDetectException
-from groq import Groq
+import re
+import asyncio
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from groq import Groq, AsyncGroq
 
 from .retrieval import ContextRetrieval
+from .semantic_cache import SemanticCache
+from .groq_batcher import GroqBatcher
 from .output_parser import OutputParser, LegalResponse
 from .config import (
     GROQ_API_KEY, GROQ_MODEL,
     LLM_TEMPERATURE, LLM_MAX_TOKENS,
     SYSTEM_PROMPT_EN, SYSTEM_PROMPT_NE,
-    CONFIDENCE_THRESHOLD
+    CONFIDENCE_THRESHOLD, LOW_CONFIDENCE_SHORT_CIRCUIT,
+    NO_CONTEXT_ANSWER_EN, NO_CONTEXT_ANSWER_NE,
+    SEMANTIC_CACHE_ENABLED, GROQ_BATCHING_ENABLED,
+    RERANKER_ENABLED, RERANK_CANDIDATES_PER_SEARCH
 )
-from .utils import logger
+from .utils import logger, run_chat, extract_legal_references
+
+# Script ranges used for language detection
+_DEVANAGARI_RE = re.compile(r"[\u0900-\u097F]")
+_LATIN_RE = re.compile(r"[A-Za-z]")
+
+# Numbers in a query (Devanagari digits included) must match for a cache hit
+_NUMBER_RE = re.compile(r"\d+")
 
 
 class NepaliLawBot:
@@ -32,10 +45,17 @@ class NepaliLawBot:
         
         # Initialize Groq client
         self.groq_client = Groq(api_key=GROQ_API_KEY)
+        self.async_groq_client = AsyncGroq(api_key=GROQ_API_KEY)
+        
+        # Coalesce concurrent async LLM calls (useful in server mode)
+        self._batcher = GroqBatcher(self.async_groq_client) if GROQ_BATCHING_ENABLED else None
         
         # Initialize output parser
         self.parser = OutputParser()
         
+        # Initialize semantic response cache
+        self.cache = SemanticCache() if SEMANTIC_CACHE_ENABLED else None
+        
         logger.info("Nepali Law Bot initialized successfully")
     
     def decide_language(self, query: str) -> str:
@@ -48,22 +68,15 @@ class NepaliLawBot:
         Returns:
             Language code ('en' or 'ne')
         """
-        try:
-            # Detect language using langdetect
-            lang = detect(query)
-            
-            # Map to our supported languages
-            if lang == "ne":
-                return "ne"
-            else:
-                return "en"
-        except LangDetectException:
-            # Default to English if detection fails
-            return "en"
+        # Nepali is written in Devanagari, so compare script character counts
+        devanagari = len(_DEVANAGARI_RE.findall(query))
+        latin = len(_LATIN_RE.findall(query))
+        
+        return "ne" if devanagari > latin else "en"
     
-    def generate_answer(self, query: str, context: str, language: str) -> str:
+    def _build_messages(self, query: str, context: str, language: str) -> List[Dict[str, str]]:
         """
-        Generate answer using Groq LLM
+        Build chat messages for the LLM
         
         Args:
             query: User query
@@ -71,7 +84,7 @@ class NepaliLawBot:
             language: Response language
             
         Returns:
-            Generated answer
+            List of chat messages
         """
         # Select system prompt based on language
         system_prompt = SYSTEM_PROMPT_NE if language == "ne" else SYSTEM_PROMPT_EN
@@ -82,18 +95,70 @@ class NepaliLawBot:
         else:
             language_instruction = "\n\nमहत्वपूर्ण: कृपया नेपालीमा मात्र जवाफ दिनुहोस्।"
         
-        # Create messages
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {
                 "role": "user",
                 "content": f"Context:\n{context}\n\nQuestion:\n{query}{language_instruction}"
             }
         ]
+    
+    def generate_answer(
+        self,
+        query: str,
+        context: str,
+        language: str,
+        stream: bool = False
+    ) -> Union[str, Iterator[str]]:
+        """
+        Generate answer using Groq LLM
+        
+        Args:
+            query: User query
+            context: Retrieved context
+            language: Response language
+            stream: If True, return an iterator of answer tokens
+            
+        Returns:
+            Generated answer, or an iterator of tokens when streaming
+        """
+        messages = self._build_messages(query, context, language)
         
         # Generate response
         logger.info(f"Generating answer with {GROQ_MODEL}")
         completion = self.groq_client.chat.completions.create(
+            model=GROQ_MODEL,
+            messages=messages,
+            temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_TOKENS,
+            stream=stream
+        )
+        
+        if stream:
+            return (chunk.choices[0].delta.content or "" for chunk in completion)
+        
+        return completion.choices[0].message.content
+    
+    async def agenerate_answer(self, query: str, context: str, language: str) -> str:
+        """
+        Generate answer using the async Groq client
+        
+        Args:
+            query: User query
+            context: Retrieved context
+            language: Response language
+            
+        Returns:
+            Generated answer
+        """
+        messages = self._build_messages(query, context, language)
+        
+        if self._batcher is not None:
+            return await self._batcher.submit(messages[0]["content"], messages[1]["content"])
+        
+        # Generate response
+        logger.info(f"Generating answer with {GROQ_MODEL}")
+        completion = await self.async_groq_client.chat.completions.create(
             model=GROQ_MODEL,
             messages=messages,
             temperature=LLM_TEMPERATURE,
@@ -102,16 +167,55 @@ class NepaliLawBot:
         
         return completion.choices[0].message.content
     
-    def query(self, user_query: str, return_raw: bool = False) -> LegalResponse:
+    @staticmethod
+    def _cache_key(user_query: str, language: str) -> Tuple:
         """
-        Process user query and return structured response
+        Build the exact-match part of the semantic cache key
+        
+        Embeddings of "दफा 5" and "दफा 6" queries are nearly identical, so
+        cached answers are only reused for the same language, legal
+        references and numbers.
         
         Args:
             user_query: User's legal query
-            return_raw: If True, return raw dict instead of LegalResponse
+            language: Detected query language
             
         Returns:
-            LegalResponse object with answer, citations, and confidence
+            Hashable cache key
+        """
+        references = extract_legal_references(user_query)
+        return (
+            language,
+            tuple((key, tuple(sorted(values))) for key, values in sorted(references.items())),
+            tuple(_NUMBER_RE.findall(user_query))
+        )
+    
+    def _lookup_cache(self, query_vec: Any, user_query: str, language: str) -> Optional[LegalResponse]:
+        """
+        Look up a cached response for a semantically similar query
+        
+        Args:
+            query_vec: Query embedding
+            user_query: User's legal query
+            language: Detected query language
+            
+        Returns:
+            Cached LegalResponse for the same language and references, or None
+        """
+        if self.cache is None:
+            return None
+        
+        return self.cache.lookup(query_vec, self._cache_key(user_query, language))
+    
+    def _prepare_query(self, user_query: str) -> Tuple[str, Any, Optional[LegalResponse]]:
+        """
+        Detect language, encode the query and check the semantic cache
+        
+        Args:
+            user_query: User's legal query
+            
+        Returns:
+            Tuple of (language, query embedding, cached response or None)
         """
         logger.info(f"Processing query: {user_query[:100]}...")
         
@@ -119,10 +223,72 @@ class NepaliLawBot:
         language = self.decide_language(user_query)
         logger.info(f"Detected language: {language}")
         
-        # Retrieve relevant documents
-        documents = self.retrieval.retrieve_context(user_query)
+        # Encode query once for both the cache and retrieval
+        query_vec = self.retrieval.encode_query(user_query)
         
-        # Rerank using metadata
+        return language, query_vec, self._lookup_cache(query_vec, user_query, language)
+    
+    def _retrieve(self, user_query: str, query_vec: Any) -> Tuple[float, List[Dict[str, Any]], str]:
+        """
+        Retrieve, rerank and filter documents and build the LLM context
+        
+        Args:
+            user_query: User's legal query
+            query_vec: Query embedding
+            
+        Returns:
+            Tuple of (confidence score, filtered documents, context)
+        """
+        # Retrieve relevant documents (oversampled when the reranker is on)
+        documents = self.retrieval.retrieve_context(
+            user_query, query_vec=query_vec, limit=self._retrieval_limit()
+        )
+        
+        return self._rank_and_build(user_query, documents)
+    
+    async def _aretrieve(self, user_query: str, query_vec: Any) -> Tuple[float, List[Dict[str, Any]], str]:
+        """
+        Async version of _retrieve
+        
+        Args:
+            user_query: User's legal query
+            query_vec: Query embedding
+            
+        Returns:
+            Tuple of (confidence score, filtered documents, context)
+        """
+        documents = await self.retrieval.aretrieve_context(
+            user_query, query_vec=query_vec, limit=self._retrieval_limit()
+        )
+        
+        # Reranking is CPU/GPU bound, so keep it off the event loop
+        return await asyncio.to_thread(self._rank_and_build, user_query, documents)
+    
+    @staticmethod
+    def _retrieval_limit() -> Optional[int]:
+        """Per-search retrieval limit (oversample candidates for the reranker)"""
+        return RERANK_CANDIDATES_PER_SEARCH if RERANKER_ENABLED else None
+    
+    def _rank_and_build(
+        self,
+        user_query: str,
+        documents: List[Dict[str, Any]]
+    ) -> Tuple[float, List[Dict[str, Any]], str]:
+        """
+        Rerank and filter retrieved documents and build the LLM context
+        
+        Args:
+            user_query: User's legal query
+            documents: Retrieved documents
+            
+        Returns:
+            Tuple of (confidence score, filtered documents, context)
+        """
+        # Keep the cross-encoder's best matches
+        if RERANKER_ENABLED:
+            documents = self.retrieval.rerank_cross_encoder(user_query, documents)
+        
+        # Rerank using metadata (a boost on the cross-encoder order when it ran)
         documents = self.retrieval.rerank_by_metadata(documents, user_query)
         
         # Calculate confidence score
@@ -135,60 +301,181 @@ class NepaliLawBot:
         # Build context
         context = self.retrieval.build_context(filtered_docs)
         
-        # Generate answer
-        answer = self.generate_answer(user_query, context, language)
+        return confidence_score, filtered_docs, context
+    
+    def _short_circuit_response(
+        self,
+        user_query: str,
+        query_vec: Any,
+        confidence_score: float,
+        language: str
+    ) -> Optional[LegalResponse]:
+        """
+        Build a canned response when retrieval found nothing relevant
+        
+        Skips the LLM call entirely for clearly off-topic queries.
+        
+        Args:
+            user_query: User's legal query
+            query_vec: Query embedding
+            confidence_score: Confidence score (0-1)
+            language: Response language
+            
+        Returns:
+            Canned LegalResponse, or None if the LLM should be called
+        """
+        if confidence_score >= LOW_CONFIDENCE_SHORT_CIRCUIT:
+            return None
         
-        # Create structured response
+        logger.info("Confidence below short-circuit floor, skipping LLM call")
+        answer = NO_CONTEXT_ANSWER_NE if language == "ne" else NO_CONTEXT_ANSWER_EN
+        
+        return self._finalize_response(user_query, query_vec, answer, confidence_score, language, [])
+    
+    def _finalize_response(
+        self,
+        user_query: str,
+        query_vec: Any,
+        answer: str,
+        confidence_score: float,
+        language: str,
+        sources: List[Dict[str, Any]]
+    ) -> LegalResponse:
+        """
+        Create the structured response and store it in the semantic cache
+        
+        Args:
+            user_query: User's legal query
+            query_vec: Query embedding
+            answer: Generated answer
+            confidence_score: Confidence score (0-1)
+            language: Response language
+            sources: Source documents
+            
+        Returns:
+            LegalResponse object
+        """
         response = self.parser.create_response(
             answer=answer,
             confidence_score=confidence_score,
             language=language,
-            sources=filtered_docs,
+            sources=sources,
             confidence_threshold=CONFIDENCE_THRESHOLD
         )
         
+        if self.cache is not None:
+            self.cache.put(query_vec, response, self._cache_key(user_query, language))
+        
         logger.info("Query processed successfully")
         
         return response
     
+    def query(self, user_query: str, return_raw: bool = False) -> LegalResponse:
+        """
+        Process user query and return structured response
+        
+        Args:
+            user_query: User's legal query
+            return_raw: If True, return raw dict instead of LegalResponse
+            
+        Returns:
+            LegalResponse object with answer, citations, and confidence
+        """
+        language, query_vec, cached = self._prepare_query(user_query)
+        if cached is not None:
+            return cached
+        
+        confidence_score, filtered_docs, context = self._retrieve(user_query, query_vec)
+        
+        canned = self._short_circuit_response(user_query, query_vec, confidence_score, language)
+        if canned is not None:
+            return canned
+        
+        # Generate answer
+        answer = self.generate_answer(user_query, context, language)
+        
+        return self._finalize_response(
+            user_query, query_vec, answer, confidence_score, language, filtered_docs
+        )
+    
+    async def aquery(self, user_query: str) -> LegalResponse:
+        """
+        Process user query without blocking the event loop
+        
+        Language detection and query encoding run concurrently in worker
+        threads, Qdrant is queried with the async client, and the LLM call
+        uses the async Groq client.
+        
+        Args:
+            user_query: User's legal query
+            
+        Returns:
+            LegalResponse object with answer, citations, and confidence
+        """
+        logger.info(f"Processing query: {user_query[:100]}...")
+        
+        language, query_vec = await asyncio.gather(
+            asyncio.to_thread(self.decide_language, user_query),
+            asyncio.to_thread(self.retrieval.encode_query, user_query)
+        )
+        logger.info(f"Detected language: {language}")
+        
+        cached = self._lookup_cache(query_vec, user_query, language)
+        if cached is not None:
+            return cached
+        
+        confidence_score, filtered_docs, context = await self._aretrieve(user_query, query_vec)
+        
+        canned = self._short_circuit_response(user_query, query_vec, confidence_score, language)
+        if canned is not None:
+            return canned
+        
+        # Generate answer
+        answer = await self.agenerate_answer(user_query, context, language)
+        
+        return self._finalize_response(
+            user_query, query_vec, answer, confidence_score, language, filtered_docs
+        )
+    
+    def query_stream(self, user_query: str) -> Iterator[Union[str, LegalResponse]]:
+        """
+        Process user query, streaming answer tokens as they are generated
+        
+        Args:
+            user_query: User's legal query
+            
+        Yields:
+            Answer tokens, followed by the final LegalResponse
+        """
+        language, query_vec, cached = self._prepare_query(user_query)
+        if cached is not None:
+            yield cached.answer
+            yield cached
+            return
+        
+        confidence_score, filtered_docs, context = self._retrieve(user_query, query_vec)
+        
+        canned = self._short_circuit_response(user_query, query_vec, confidence_score, language)
+        if canned is not None:
+            yield canned.answer
+            yield canned
+            return
+        
+        # Stream answer tokens while accumulating the full answer
+        tokens = []
+        for token in self.generate_answer(user_query, context, language, stream=True):
+            tokens.append(token)
+            yield token
+        
+        yield self._finalize_response(
+            user_query, query_vec, "".join(tokens), confidence_score, language, filtered_docs
+        )
+    
     def chat(self) -> None:
         """
         Interactive chat loop
         """
-        print("\n" + "=" * 80)
-        print("🏛️  NEPALI LAW BOT - Legal Assistant for Nepali Law")
-        print("=" * 80)
-        print("\nType your legal question in English or Nepali.")
-        print("Type 'quit' or 'exit' to end the session.\n")
-        
-        while True:
-            try:
-                # Get user input
-                user_input = input("\n💬 You: ").strip()
-                
-                # Check for exit commands
-                if user_input.lower() in ["quit", "exit", "bye"]:
-                    print("\n👋 Thank you for using Nepali Law Bot. Goodbye!\n")
-                    break
-                
-                # Skip empty input
-                if not user_input:
-                    continue
-                
-                # Process query
-                print("\n🔍 Searching legal documents...")
-                response = self.query(user_input)
-                
-                # Display formatted response
-                print("\n" + response.format_for_display())
-                
-            except KeyboardInterrupt:
-                print("\n\n👋 Session interrupted. Goodbye!\n")
-                break
-            except Exception as e:
-                logger.error(f"Error processing query: {e}")
-                print(f"\n❌ Error: {e}")
-                print("Please try again with a different query.\n")
+        run_chat(self.query_stream)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+"""
+HTTP client for a running Nepali Law Bot server
+Mirrors the NepaliLawBot query interface without loading any models locally
+"""
+import os
+import json
+import urllib.request
+from typing import Iterator, Union
+
+from .output_parser import LegalResponse
+from .utils import run_chat
+
+
+class LawBotClient:
+    """Client for the Nepali Law Bot HTTP server"""
+    
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        """
+        Initialize client
+        
+        Args:
+            base_url: Server URL, e.g. http://localhost:8000
+            timeout: Request timeout in seconds
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+    
+    def _post(self, path: str, text: str):
+        """Send a query to a server endpoint and return the open response"""
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps({"text": text}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        return urllib.request.urlopen(request, timeout=self.timeout)
+    
+    def query(self, user_query: str) -> LegalResponse:
+        """
+        Send a query and return the structured response
+        
+        Args:
+            user_query: User's legal query
+            
+        Returns:
+            LegalResponse object
+        """
+        with self._post("/query", user_query) as resp:
+            return LegalResponse.model_validate_json(resp.read())
+    
+    def query_stream(self, user_query: str) -> Iterator[Union[str, LegalResponse]]:
+        """
+        Send a query and stream the answer
+        
+        Args:
+            user_query: User's legal query
+            
+        Yields:
+            Answer tokens, followed by the final LegalResponse
+        """
+        with self._post("/stream", user_query) as resp:
+            for line in resp:
+                event = json.loads(line)
+                if "response" in event:
+                    yield LegalResponse.model_validate(event["response"])
+                else:
+                    yield event["token"]
+    
+    def chat(self) -> None:
+        """
+        Interactive chat loop
+        """
+        run_chat(self.query_stream)
+
+
+def load_bot():
+    """
+    Connect to a running server if NLBOT_SERVER is set, else load the bot locally
+    
+    Returns:
+        LawBotClient or NepaliLawBot instance
+    """
+    server_url = os.getenv("NLBOT_SERVER")
+    if server_url:
+        return LawBotClient(server_url)
+    
+    from .chatbot import NepaliLawBot
+    return NepaliLawBot()
@@ -22,8 +22,13 @@ if not QDRANT_URL or not QDRANT_API_KEY:
     raise ValueError("QDRANT_URL or QDRANT_API_KEY not found in environment variables")
 
 QDRANT_COLLECTION_NAME = "nepali_law_vectors"
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
 VECTOR_SIZE = 1024
 
+# Retrieval metadata cache (MongoDB documents keyed by qdrant_id)
+METADATA_CACHE_SIZE = 4096
+
 # Groq Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
@@ -33,26 +38,64 @@ GROQ_MODEL = "llama-3.1-8b-instant"
 
 # Embedding Model Configuration
 EMBEDDING_MODEL_NAME = "intfloat/multilingual-e5-large"
+QUERY_EMBEDDING_CACHE_SIZE = 1024  # Memoized query embeddings
+EMBEDDING_QUERY_PROMPT = "query: "  # e5 models expect these input prefixes
+EMBEDDING_PASSAGE_PROMPT = "passage: "
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # "torch" or "onnx_int8"
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "./models/multilingual-e5-large-onnx")
+EMBEDDING_ONNX_INT8_FILE = "onnx/model_qint8_avx512_vnni.onnx"
 
 # Document Processing Configuration
 CHUNK_MIN_LENGTH = 100
 MAX_CONTEXT_CHARS = 9000
 
+# Ingestion Configuration
+INGEST_BATCH_SIZE = 256  # Chunks written to Qdrant/MongoDB per batch
+EMBEDDING_BATCH_SIZE = 64  # Chunks per embedding model forward pass
+EMBEDDING_BATCH_SIZE_GPU = 256  # Larger batches when encoding on CUDA
+PDF_EXTRACTOR = os.getenv("PDF_EXTRACTOR", "pymupdf")  # "pymupdf" or "pdfplumber"
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "./.pdf_cache")  # Extracted text cache
+
 # Retrieval Configuration
 DEFAULT_RETRIEVAL_LIMIT = 5
 CONSTITUTION_LIMIT = 3
 MULUKI_ACT_LIMIT = 3
 ACT_LIMIT = 3
 RULE_LIMIT = 5
+HNSW_EF = 32  # Minimum HNSW search beam width; searches use max(HNSW_EF, 2 * limit)
+
+# Reranker Configuration
+RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "true").lower() == "true"
+RERANKER_MODEL_NAME = "BAAI/bge-reranker-v2-m3"
+RERANK_CANDIDATES_PER_SEARCH = 15  # Oversampled Qdrant limit per search when reranking
+RERANK_TOP_K = 5
 
 # Confidence Scoring Configuration
 CONFIDENCE_THRESHOLD = 0.5  # Minimum confidence score to avoid hallucination warning
 MIN_SIMILARITY_SCORE = 0.3  # Minimum similarity for document relevance
+LOW_CONFIDENCE_SHORT_CIRCUIT = 0.25  # Below this, skip the LLM and return a canned answer
 
 # LLM Configuration
 LLM_TEMPERATURE = 0.2
 LLM_MAX_TOKENS = 600
 
+# Groq Request Batching (server mode only)
+# Batched users' questions and contexts share one prompt, so only enable this
+# when all clients are trusted
+GROQ_BATCHING_ENABLED = os.getenv("GROQ_BATCHING_ENABLED", "false").lower() == "true"
+GROQ_BATCH_WINDOW_MS = 25  # Wait this long for more requests before calling Groq
+GROQ_BATCH_MAX_SIZE = 4
+
+# Semantic Cache Configuration
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = 0.92  # Minimum cosine similarity to reuse a cached answer
+SEMANTIC_CACHE_TTL = 86400  # Seconds before a cached answer expires
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+
+# Server Configuration
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+
 # Document Types and Priorities
 DOC_TYPES = {
     "constitution": 1,
@@ -82,6 +125,13 @@ SYSTEM_PROMPT_NE = """तपाईं नेपालको कानुनम
 
 महत्वपूर्ण: प्रयोगकर्ताले नेपालीमा सोधेका छन्, त्यसैले तपाईंले नेपालीमा मात्र जवाफ दिनुपर्छ।"""
 
+# Canned answers for queries with no relevant legal provisions
+NO_CONTEXT_ANSWER_EN = """I could not find relevant Nepali legal provisions for this question. \
+It may not be related to Nepali law. Please rephrase your question or consult a legal expert."""
+
+NO_CONTEXT_ANSWER_NE = """यो प्रश्नसँग सम्बन्धित नेपाली कानुनी प्रावधान फेला परेन। \
+यो नेपाली कानुनसँग सम्बन्धित नहुन सक्छ। कृपया प्रश्न फेरि लेख्नुहोस् वा कानुनी विशेषज्ञसँग परामर्श गर्नुहोस्।"""
+
 # Drive Link - Contains nested folders with all PDF documents
 DRIVE_LINK = os.getenv("DRIVE_LINK")
 if not DRIVE_LINK:
@@ -0,0 +1,177 @@
+"""
+Request coalescing for Groq chat completions
+Combines concurrent queries into one API round trip in server mode
+"""
+import re
+import asyncio
+import secrets
+from typing import Dict, List, Optional, Set, Tuple
+from groq import AsyncGroq
+
+from .config import (
+    GROQ_MODEL, LLM_TEMPERATURE, LLM_MAX_TOKENS,
+    GROQ_BATCH_WINDOW_MS, GROQ_BATCH_MAX_SIZE
+)
+from .utils import logger
+
+# (system prompt, user message, future for the answer)
+_PendingRequest = Tuple[str, str, asyncio.Future]
+
+# Runs of angle brackets that could imitate the batch delimiters in user text
+_DELIMITER_LIKE_RE = re.compile(r"<{3,}|>{3,}")
+
+_BATCH_INSTRUCTIONS = """You will receive {n} independent questions, each with its own legal context.
+Answer every question separately, following all instructions given inside it and
+using only the context given inside that question's own block.
+Format your reply exactly as:
+<<<ANSWER {nonce} 1>>>
+(answer to question 1)
+<<<END {nonce} 1>>>
+and so on for every question, with nothing outside these blocks."""
+
+
+class GroqBatcher:
+    """Coalesces concurrent chat-completion requests into single Groq calls"""
+    
+    def __init__(
+        self,
+        client: AsyncGroq,
+        window_ms: float = GROQ_BATCH_WINDOW_MS,
+        max_batch_size: int = GROQ_BATCH_MAX_SIZE
+    ):
+        """
+        Initialize batcher
+        
+        Args:
+            client: Async Groq client
+            window_ms: How long to wait for more requests after the first one
+            max_batch_size: Maximum number of requests per Groq call
+        """
+        self.client = client
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        
+        # Created on first submit so they bind to the running event loop
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        
+        # The event loop only keeps weak references to tasks
+        self._dispatch_tasks: Set[asyncio.Task] = set()
+    
+    async def submit(self, system_prompt: str, user_message: str) -> str:
+        """
+        Queue a request and wait for its answer
+        
+        Args:
+            system_prompt: System prompt for the request
+            user_message: User message (context + question)
+        
+        Returns:
+            Generated answer
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((system_prompt, user_message, future))
+        return await future
+    
+    async def _run(self) -> None:
+        """Collect requests arriving within the batching window and dispatch them"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Requests can only share a call if they share a system prompt
+            groups: Dict[str, List[_PendingRequest]] = {}
+            for request in batch:
+                groups.setdefault(request[0], []).append(request)
+            
+            for requests in groups.values():
+                task = asyncio.create_task(self._dispatch(requests))
+                self._dispatch_tasks.add(task)
+                task.add_done_callback(self._dispatch_tasks.discard)
+    
+    async def _complete(self, system_prompt: str, user_message: str, max_tokens: int) -> str:
+        """Make a single Groq chat-completion call"""
+        completion = await self.client.chat.completions.create(
+            model=GROQ_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            temperature=LLM_TEMPERATURE,
+            max_tokens=max_tokens
+        )
+        return completion.choices[0].message.content
+    
+    async def _dispatch(self, requests: List[_PendingRequest]) -> None:
+        """Answer a group of requests with one Groq call, resolving their futures"""
+        system_prompt = requests[0][0]
+        
+        try:
+            if len(requests) == 1:
+                answer = await self._complete(system_prompt, requests[0][1], LLM_MAX_TOKENS)
+                _resolve(requests[0][2], answer)
+                return
+            
+            logger.info(f"Coalescing {len(requests)} requests into one Groq call")
+            
+            # A per-batch nonce in every delimiter, and no delimiter-like text in
+            # user messages, so one user cannot close or forge another's block
+            nonce = secrets.token_hex(8)
+            blocks = [_BATCH_INSTRUCTIONS.format(n=len(requests), nonce=nonce)]
+            for i, (_, user_message, _) in enumerate(requests, 1):
+                user_message = _DELIMITER_LIKE_RE.sub(lambda m: m.group()[:2], user_message)
+                blocks.append(f"<<<QUERY {nonce} {i}>>>\n{user_message}\n<<<END {nonce} {i}>>>")
+            
+            response = await self._complete(
+                system_prompt,
+                "\n\n".join(blocks),
+                LLM_MAX_TOKENS * len(requests)
+            )
+            answer_re = re.compile(
+                rf"<<<ANSWER {nonce} (\d+)>>>\s*(.*?)\s*<<<END {nonce} \1>>>", re.DOTALL
+            )
+            answers = {int(m.group(1)): m.group(2) for m in answer_re.finditer(response)}
+            
+            # Fall back to individual calls for answers the model did not delimit
+            # (callers that were cancelled meanwhile no longer need one)
+            missing = [
+                i for i in range(1, len(requests) + 1)
+                if not answers.get(i) and not requests[i - 1][2].done()
+            ]
+            if missing:
+                logger.warning(f"Batched response missing {len(missing)} answers, retrying individually")
+                retries = await asyncio.gather(*(
+                    self._complete(system_prompt, requests[i - 1][1], LLM_MAX_TOKENS)
+                    for i in missing
+                ))
+                answers.update(zip(missing, retries))
+            
+            for i, (_, _, future) in enumerate(requests, 1):
+                _resolve(future, answers.get(i))
+        
+        # Only Groq / network failures reach here; resolving never raises
+        except Exception as e:
+            for _, _, future in requests:
+                if not future.done():
+                    future.set_exception(e)
+
+
+def _resolve(future: asyncio.Future, answer: str) -> None:
+    """Set a caller's answer unless the caller was cancelled"""
+    if not future.done():
+        future.set_result(answer)
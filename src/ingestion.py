@@ -4,22 +4,41 @@ Handles PDF extraction, chunking, and storage in MongoDB + Qdrant
 """
 import os
 import re
+import argparse
 import uuid
-from typing import Dict, List, Tuple
-import pdfplumber
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional
 from tqdm import tqdm
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
 from qdrant_client import QdrantClient
 from qdrant_client.models import VectorParams, Distance, PointStruct
-from sentence_transformers import SentenceTransformer
 
 from .config import (
     MONGO_URI, MONGO_DB_NAME, MONGO_COLLECTION_NAME,
     QDRANT_URL, QDRANT_API_KEY, QDRANT_COLLECTION_NAME,
-    VECTOR_SIZE, EMBEDDING_MODEL_NAME, CHUNK_MIN_LENGTH
+    QDRANT_PREFER_GRPC, QDRANT_GRPC_PORT, VECTOR_SIZE, EMBEDDING_PASSAGE_PROMPT,
+    INGEST_BATCH_SIZE, EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_SIZE_GPU,
+    PDF_EXTRACTOR
 )
+from .pdf_extraction import detect_doc_type, chunk_text, extract_pdf
 from .utils import logger
 
+# MongoDB error code for unique index violations
+_DUPLICATE_KEY_ERROR = 11000
+
+# Namespace for content-addressed Qdrant point IDs (must never change)
+_QDRANT_ID_NAMESPACE = uuid.NAMESPACE_URL
+
+# Nepali legal structure patterns
+_RE_PART = re.compile(r"(भाग–?\s*\d+)\s*(.*)")
+_RE_CHAPTER = re.compile(r"(परिच्छेद–?\s*\d+)\s*(.*)")
+_RE_SECTION = re.compile(r"(दफा\s*\d+)")
+_RE_SUB = re.compile(r"(\(\d+\))")
+
 
 class DocumentIngestion:
     """Handles document ingestion pipeline"""
@@ -33,12 +52,21 @@ class DocumentIngestion:
         self.db = self.mongo_client[MONGO_DB_NAME]
         self.meta_col = self.db[MONGO_COLLECTION_NAME]
         
-        # Create unique index to prevent duplicates
+        # Create unique indexes to prevent duplicates
         self.meta_col.create_index("qdrant_id", unique=True)
+        self.meta_col.create_index(
+            "chunk_hash",
+            unique=True,
+            partialFilterExpression={"chunk_hash": {"$exists": True}}
+        )
+        self._backfill_chunk_hashes()
         logger.info(f"Connected to MongoDB: {MONGO_DB_NAME}")
         
         # Qdrant setup
-        self.qdrant = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+        self.qdrant = QdrantClient(
+            url=QDRANT_URL, api_key=QDRANT_API_KEY,
+            prefer_grpc=QDRANT_PREFER_GRPC, grpc_port=QDRANT_GRPC_PORT
+        )
         
         # Create collection if not exists
         collections = [c.name for c in self.qdrant.get_collections().collections]
@@ -51,30 +79,17 @@ class DocumentIngestion:
         else:
             logger.info(f"Using existing Qdrant collection: {QDRANT_COLLECTION_NAME}")
         
-        # Load embedding model
-        logger.info(f"Loading embedding model: {EMBEDDING_MODEL_NAME}")
-        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        # Load embedding model (shared across instances). Imported here because
+        # extraction workers re-import this module and must not load torch
+        from .models import get_embedding_model, get_device
+        self.embedding_model = get_embedding_model()
+        self.embedding_batch_size = (
+            EMBEDDING_BATCH_SIZE_GPU if get_device() == "cuda" else EMBEDDING_BATCH_SIZE
+        )
         logger.info("Document Ingestion initialized successfully")
     
-    @staticmethod
-    def detect_doc_type(path: str) -> Tuple[str, int]:
-        """
-        Detect document type and priority from file path
-        
-        Args:
-            path: File path
-            
-        Returns:
-            Tuple of (doc_type, priority)
-        """
-        p = path.lower()
-        if "संविधान" in p:
-            return "constitution", 1
-        if "मुलुकी" in p:
-            return "muluki_act", 2
-        if "नियम" in p or "विनियम" in p:
-            return "rule", 4
-        return "act", 3
+    # Shared with the extraction workers, which must not import this module
+    detect_doc_type = staticmethod(detect_doc_type)
     
     @staticmethod
     def extract_structure(text: str) -> Dict[str, str]:
@@ -97,49 +112,152 @@ class DocumentIngestion:
         }
         
         # Extract Part (भाग)
-        part = re.search(r"(भाग–?\s*\d+)\s*(.*)", text)
+        part = _RE_PART.search(text)
         if part:
             structure["भाग"] = part.group(1)
             structure["भाग_title"] = part.group(2)
         
         # Extract Chapter (परिच्छेद)
-        pariched = re.search(r"(परिच्छेद–?\s*\d+)\s*(.*)", text)
+        pariched = _RE_CHAPTER.search(text)
         if pariched:
             structure["परिच्छेद"] = pariched.group(1)
             structure["परिच्छेद_title"] = pariched.group(2)
         
         # Extract Section (दफा)
-        dafa = re.search(r"(दफा\s*\d+)", text)
+        dafa = _RE_SECTION.search(text)
         if dafa:
             structure["दफा"] = dafa.group(1)
         
         # Extract Sub-section (उपदफा)
-        up = re.search(r"(\(\d+\))", text)
+        up = _RE_SUB.search(text)
         if up:
             structure["उपदफा"] = up.group(1)
         
         return structure
     
+    chunk_text = staticmethod(chunk_text)
+    
     @staticmethod
-    def chunk_text(text: str) -> List[str]:
+    def hash_chunk(text: str, doc_type: str) -> str:
+        """
+        Compute the content hash used to deduplicate chunks
+        
+        Args:
+            text: Chunk text
+            doc_type: Document type of the chunk
+            
+        Returns:
+            Hex SHA-256 digest
+        """
+        return hashlib.sha256(f"{doc_type}\n{text}".encode("utf-8")).hexdigest()
+    
+    def _backfill_chunk_hashes(self) -> None:
+        """
+        Add chunk_hash to chunks stored before content hashing was introduced
+        
+        Legacy chunks keep their random qdrant_id; once hashed, re-ingesting
+        the same text is skipped like any other duplicate instead of being
+        stored a second time under a content-addressed ID.
+        """
+        updates = [
+            UpdateOne(
+                {"_id": row["_id"]},
+                {"$set": {"chunk_hash": self.hash_chunk(row["text"], row["doc_type"])}}
+            )
+            for row in self.meta_col.find(
+                {"chunk_hash": {"$exists": False}},
+                projection={"text": True, "doc_type": True}
+            )
+        ]
+        if not updates:
+            return
+        
+        duplicates = 0
+        try:
+            self.meta_col.bulk_write(updates, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                if error["code"] != _DUPLICATE_KEY_ERROR:
+                    raise
+                duplicates += 1
+        
+        logger.info(f"Backfilled chunk_hash on {len(updates) - duplicates} existing chunks")
+        if duplicates:
+            logger.warning(
+                f"{duplicates} existing chunks duplicate another stored chunk "
+                "and were left without chunk_hash"
+            )
+    
+    def _store_batch(self, records: List[Dict[str, Any]]) -> int:
         """
-        Split text into chunks by section (दफा)
+        Embed and store a batch of chunk records, skipping duplicates
+        
+        Vectors are written before metadata: Qdrant upserts are idempotent
+        (content-addressed IDs), so a failure part-way through leaves nothing
+        that a later run would mistake for an already stored chunk.
         
         Args:
-            text: Full document text
+            records: Chunk metadata dicts with qdrant_id and chunk_hash
             
         Returns:
-            List of text chunks
+            Number of chunks stored
         """
-        chunks = re.split(r"\n(?=दफा\s*\d+)", text)
-        return [c.strip() for c in chunks if len(c.strip()) > CHUNK_MIN_LENGTH]
+        # Skip chunks stored by this or an earlier run
+        existing = set(self.meta_col.distinct(
+            "chunk_hash", {"chunk_hash": {"$in": [r["chunk_hash"] for r in records]}}
+        ))
+        new_records = [r for r in records if r["chunk_hash"] not in existing]
+        if not new_records:
+            return 0
+        
+        # Create embeddings for the whole batch at once
+        embeddings = self.embedding_model.encode(
+            [r["text"] for r in new_records],
+            prompt=EMBEDDING_PASSAGE_PROMPT,
+            batch_size=self.embedding_batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        
+        # Store in Qdrant
+        self.qdrant.upsert(
+            collection_name=QDRANT_COLLECTION_NAME,
+            points=[
+                PointStruct(
+                    id=record["qdrant_id"],
+                    vector=embedding.tolist(),
+                    payload={"doc_type": record["doc_type"]}
+                )
+                for record, embedding in zip(new_records, embeddings)
+            ]
+        )
+        
+        # Store metadata in MongoDB; the chunk_hash index rejects repeats within
+        # the batch and chunks another run stored meanwhile (same vector ID)
+        duplicates = 0
+        try:
+            self.meta_col.insert_many(new_records, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                if error["code"] != _DUPLICATE_KEY_ERROR:
+                    raise
+                duplicates += 1
+        
+        return len(new_records) - duplicates
     
-    def ingest_documents(self, base_dir: str) -> None:
+    def ingest_documents(
+        self,
+        base_dir: str,
+        max_workers: Optional[int] = None,
+        extractor: str = PDF_EXTRACTOR
+    ) -> None:
         """
         Ingest all PDF documents from directory
         
         Args:
             base_dir: Base directory containing PDF files
+            max_workers: Number of PDF extraction processes (defaults to CPU count)
+            extractor: PDF text extractor ('pymupdf' or 'pdfplumber')
         """
         # Find all PDF files
         pdf_files = []
@@ -150,65 +268,58 @@ class DocumentIngestion:
         
         logger.info(f"Found {len(pdf_files)} PDF files to process")
         
-        # Process each PDF
-        for pdf_path in tqdm(pdf_files, desc="Ingesting documents"):
-            doc_type, priority = self.detect_doc_type(pdf_path)
-            
-            # Extract text from PDF
-            with pdfplumber.open(pdf_path) as pdf:
-                full_text = "\n".join(
-                    page.extract_text() or "" for page in pdf.pages
-                )
-            
-            # Chunk the text
-            chunks = self.chunk_text(full_text)
+        pending = []
+        stored = 0
+        
+        # Extract PDFs in parallel; embedding and storage stay in this process.
+        # Spawn rather than fork: this process already holds a MongoDB client,
+        # a gRPC channel and possibly a CUDA context, none of which survive a fork.
+        # Workers only run pdf_extraction, which imports no models or clients
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            results = executor.map(
+                partial(extract_pdf, extractor=extractor), pdf_files, chunksize=1
+            )
             
-            # Process each chunk
-            for chunk in chunks:
-                structure = self.extract_structure(chunk)
-                
-                # Check if chunk already exists (prevent duplicates)
-                exists = self.meta_col.find_one({
-                    "text": chunk,
-                    "doc_type": doc_type
-                })
-                if exists:
-                    continue
-                
-                # Generate unique ID
-                qdrant_id = str(uuid.uuid4())
-                
-                # Create embedding
-                embedding = self.embedding_model.encode(
-                    "passage: " + chunk
-                ).tolist()
+            for pdf_path, chunks, doc_type, priority in tqdm(
+                results, total=len(pdf_files), desc="Ingesting documents"
+            ):
+                # Collect chunk metadata for batched embedding and storage
+                for chunk in chunks:
+                    chunk_hash = self.hash_chunk(chunk, doc_type)
+                    pending.append({
+                        # Content-addressed ID keeps Qdrant upserts idempotent
+                        "qdrant_id": str(uuid.uuid5(_QDRANT_ID_NAMESPACE, chunk_hash)),
+                        "chunk_hash": chunk_hash,
+                        "doc_type": doc_type,
+                        "priority": priority,
+                        "file_path": pdf_path,
+                        **self.extract_structure(chunk),
+                        "text": chunk
+                    })
                 
-                # Store in Qdrant
-                self.qdrant.upsert(
-                    collection_name=QDRANT_COLLECTION_NAME,
-                    points=[
-                        PointStruct(
-                            id=qdrant_id,
-                            vector=embedding,
-                            payload={"doc_type": doc_type}
-                        )
-                    ]
-                )
-                
-                # Store metadata in MongoDB
-                self.meta_col.insert_one({
-                    "qdrant_id": qdrant_id,
-                    "doc_type": doc_type,
-                    "priority": priority,
-                    "file_path": pdf_path,
-                    **structure,
-                    "text": chunk
-                })
-        
-        logger.info("Document ingestion completed")
+                while len(pending) >= INGEST_BATCH_SIZE:
+                    stored += self._store_batch(pending[:INGEST_BATCH_SIZE])
+                    pending = pending[INGEST_BATCH_SIZE:]
+        
+        if pending:
+            stored += self._store_batch(pending)
+        
+        logger.info(f"Document ingestion completed ({stored} new chunks stored)")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest legal PDFs into MongoDB + Qdrant")
+    parser.add_argument(
+        "--extractor",
+        choices=["pymupdf", "pdfplumber"],
+        default=PDF_EXTRACTOR,
+        help="PDF text extractor"
+    )
+    args = parser.parse_args()
+    
     # Example usage
     ingestion = DocumentIngestion()
     
@@ -216,7 +327,7 @@ if __name__ == "__main__":
     docs_dir = os.getenv("DOCS_DIR", "./docs")
     
     if os.path.exists(docs_dir):
-        ingestion.ingest_documents(docs_dir)
+        ingestion.ingest_documents(docs_dir, extractor=args.extractor)
     else:
         logger.error(f"Documents directory not found: {docs_dir}")
         logger.info("Please set DOCS_DIR environment variable or create ./docs directory")
@@ -0,0 +1,92 @@
+"""
+Shared model loaders for Nepali Law Bot
+Loads heavy models once per process so every component reuses the same weights
+"""
+import os
+from functools import lru_cache
+import torch
+from sentence_transformers import SentenceTransformer, CrossEncoder
+
+from .config import (
+    EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND,
+    EMBEDDING_ONNX_DIR, EMBEDDING_ONNX_INT8_FILE,
+    RERANKER_MODEL_NAME
+)
+from .utils import logger
+
+
+@lru_cache(maxsize=1)
+def get_device() -> str:
+    """
+    Pick the device for model inference
+    
+    Returns:
+        'cuda' if a GPU is available, otherwise 'cpu'
+    """
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+@lru_cache(maxsize=1)
+def get_embedding_model() -> SentenceTransformer:
+    """
+    Load the embedding model (cached per process)
+    
+    Returns:
+        Shared SentenceTransformer instance
+    """
+    logger.info(f"Loading embedding model: {EMBEDDING_MODEL_NAME} ({EMBEDDING_BACKEND})")
+    
+    if EMBEDDING_BACKEND == "onnx_int8":
+        return _load_onnx_int8_model()
+    
+    device = get_device()
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=device)
+    
+    # fp16 halves memory traffic on GPU without affecting cosine rankings
+    if device == "cuda":
+        model.half()
+    
+    return model
+
+
+def _load_onnx_int8_model() -> SentenceTransformer:
+    """
+    Load the int8-quantized ONNX embedding model, exporting it on first use
+    
+    Requires optimum[onnxruntime]. The export is a one-time cost; later runs
+    load the quantized model straight from EMBEDDING_ONNX_DIR.
+    
+    Returns:
+        SentenceTransformer running on ONNX Runtime
+    """
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+    
+    if not os.path.exists(os.path.join(EMBEDDING_ONNX_DIR, EMBEDDING_ONNX_INT8_FILE)):
+        logger.info(f"Exporting int8 ONNX embedding model to {EMBEDDING_ONNX_DIR}")
+        model = SentenceTransformer(EMBEDDING_MODEL_NAME, backend="onnx")
+        model.save(EMBEDDING_ONNX_DIR)
+        export_dynamic_quantized_onnx_model(model, "avx512_vnni", EMBEDDING_ONNX_DIR)
+    
+    return SentenceTransformer(
+        EMBEDDING_ONNX_DIR,
+        backend="onnx",
+        model_kwargs={"file_name": EMBEDDING_ONNX_INT8_FILE}
+    )
+
+
+@lru_cache(maxsize=1)
+def get_reranker_model() -> CrossEncoder:
+    """
+    Load the cross-encoder reranker (cached per process)
+    
+    Returns:
+        Shared CrossEncoder instance
+    """
+    logger.info(f"Loading reranker model: {RERANKER_MODEL_NAME}")
+    device = get_device()
+    model = CrossEncoder(RERANKER_MODEL_NAME, max_length=512, device=device)
+    
+    if device == "cuda":
+        model.model.half()
+    
+    return model
@@ -2,10 +2,25 @@
 Output parser for structured legal responses
 Uses Pydantic models for validation and formatting
 """
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from typing import List, NamedTuple, Optional, Dict, Any
+from pydantic import BaseModel, Field, field_serializer
 import re
 
+# Nepali legal references in LLM answers, e.g. "दफा 17", "परिच्छेद 9", "भाग 3"
+_CITATION_RE = re.compile(
+    r"दफा\s*(?P<section>\d+)"
+    r"|परिच्छेद\s*(?P<chapter>\d+)"
+    r"|भाग\s*(?P<part>\d+)"
+)
+
+# Display rules and the 21 possible confidence bars (one block per 5%)
+_RULE = "=" * 80
+_THIN_RULE = "-" * 80
+_BARS = ["█" * i + "░" * (20 - i) for i in range(21)]
+
+# Source text shown in previews
+_PREVIEW_CHARS = 150
+
 
 class LegalCitation(BaseModel):
     """Model for a legal citation"""
@@ -25,6 +40,14 @@ class SourceDocument(BaseModel):
     structure: Dict[str, Optional[str]] = Field(default_factory=dict, description="Legal structure")
 
 
+class SourceDocumentFast(NamedTuple):
+    """Lightweight source document used in-process (same fields as SourceDocument)"""
+    doc_type: str
+    text_preview: str
+    similarity_score: float
+    structure: Dict[str, Optional[str]]
+
+
 class LegalResponse(BaseModel):
     """Structured legal response model"""
     answer: str = Field(..., description="Main answer text")
@@ -34,40 +57,53 @@ class LegalResponse(BaseModel):
     sources: List[SourceDocument] = Field(default_factory=list, description="Source documents")
     warning: Optional[str] = Field(None, description="Warning message if confidence is low")
     
-    def format_for_display(self) -> str:
+    @field_serializer("sources")
+    def serialize_sources(self, sources: List[Any]) -> List[SourceDocument]:
+        """Convert in-process sources to SourceDocument at the serialization boundary"""
+        return [
+            SourceDocument.model_construct(**source._asdict())
+            if isinstance(source, SourceDocumentFast) else source
+            for source in sources
+        ]
+    
+    def format_for_display(self, include_answer: bool = True) -> str:
         """
         Format response for console display
         
+        Args:
+            include_answer: If False, omit the answer (e.g. when it was streamed)
+        
         Returns:
             Formatted string for display
         """
         output = []
         
         # Header
-        output.append("=" * 80)
+        output.append(_RULE)
         output.append("LEGAL RESPONSE")
-        output.append("=" * 80)
+        output.append(_RULE)
         
         # Warning if low confidence
         if self.warning:
             output.append(f"\n⚠️  WARNING: {self.warning}\n")
         
         # Answer
-        output.append("\n📝 ANSWER:")
-        output.append("-" * 80)
-        output.append(self.answer)
-        output.append("")
+        if include_answer:
+            output.append("\n📝 ANSWER:")
+            output.append(_THIN_RULE)
+            output.append(self.answer)
+            output.append("")
         
         # Confidence
         confidence_pct = self.confidence_score * 100
-        confidence_bar = "█" * int(confidence_pct / 5) + "░" * (20 - int(confidence_pct / 5))
+        confidence_bar = _BARS[min(20, int(confidence_pct / 5))]
         output.append(f"📊 CONFIDENCE: {confidence_bar} {confidence_pct:.1f}%")
         output.append("")
         
         # Citations
         if self.citations:
             output.append("📚 LEGAL CITATIONS:")
-            output.append("-" * 80)
+            output.append(_THIN_RULE)
             for i, citation in enumerate(self.citations, 1):
                 parts = []
                 if citation.law_name:
@@ -87,7 +123,7 @@ class LegalResponse(BaseModel):
         # Sources
         if self.sources:
             output.append("📖 SOURCES:")
-            output.append("-" * 80)
+            output.append(_THIN_RULE)
             for i, source in enumerate(self.sources, 1):
                 score_pct = source.similarity_score * 100
                 output.append(f"  {i}. [{source.doc_type.upper()}] Relevance: {score_pct:.1f}%")
@@ -100,12 +136,11 @@ class LegalResponse(BaseModel):
                 if structure_parts:
                     output.append(f"     {' | '.join(structure_parts)}")
                 
-                # Show text preview
-                preview = source.text_preview[:150] + "..." if len(source.text_preview) > 150 else source.text_preview
-                output.append(f"     Preview: {preview}")
+                # Show text preview (truncated when the response was built)
+                output.append(f"     Preview: {source.text_preview}")
                 output.append("")
         
-        output.append("=" * 80)
+        output.append(_RULE)
         
         return "\n".join(output)
 
@@ -124,25 +159,20 @@ class OutputParser:
         Returns:
             List of LegalCitation objects
         """
-        citations = []
-        
-        # Pattern for Nepali legal references
-        # Example: "दफा 17", "परिच्छेद 9", "भाग 3"
-        
-        # Extract sections (दफा)
-        sections = re.findall(r"दफा\s*(\d+)", text)
-        for section in sections:
-            citations.append(LegalCitation(section=f"दफा {section}"))
-        
-        # Extract chapters (परिच्छेद)
-        chapters = re.findall(r"परिच्छेद\s*(\d+)", text)
-        for chapter in chapters:
-            citations.append(LegalCitation(chapter=f"परिच्छेद {chapter}"))
+        sections, chapters, parts = [], [], []
+        
+        # Single pass over the text, grouped by category to keep output order
+        for match in _CITATION_RE.finditer(text):
+            kind = match.lastgroup
+            number = match.group(kind)
+            if kind == "section":
+                sections.append(LegalCitation.model_construct(section=f"दफा {number}"))
+            elif kind == "chapter":
+                chapters.append(LegalCitation.model_construct(chapter=f"परिच्छेद {number}"))
+            else:
+                parts.append(LegalCitation.model_construct(part=f"भाग {number}"))
         
-        # Extract parts (भाग)
-        parts = re.findall(r"भाग\s*(\d+)", text)
-        for part in parts:
-            citations.append(LegalCitation(part=f"भाग {part}"))
+        citations = sections + chapters + parts
         
         return citations
     
@@ -170,14 +200,17 @@ class OutputParser:
         # Extract citations from answer
         citations = OutputParser.extract_citations(answer)
         
-        # Create source documents
+        # Inputs come from our own retrieval layer, so skip pydantic entirely:
+        # sources are plain tuples until serialized, and the response uses
+        # model_construct; external data is validated at the client boundary
         source_docs = []
         for src in sources:
-            source_docs.append(SourceDocument(
-                doc_type=src.get("doc_type", "unknown"),
-                text_preview=src.get("text", "")[:200],
-                similarity_score=src.get("similarity_score", 0.0),
-                structure={
+            text = src.get("text", "")
+            source_docs.append(SourceDocumentFast(
+                src.get("doc_type", "unknown"),
+                text[:_PREVIEW_CHARS] + "..." if len(text) > _PREVIEW_CHARS else text,
+                float(src.get("similarity_score", 0.0)),
+                {
                     "भाग": src.get("भाग"),
                     "परिच्छेद": src.get("परिच्छेद"),
                     "दफा": src.get("दफा"),
@@ -193,10 +226,10 @@ class OutputParser:
             else:
                 warning = "This response has low confidence. Please consult with a legal expert."
         
-        return LegalResponse(
+        return LegalResponse.model_construct(
             answer=answer,
             citations=citations,
-            confidence_score=confidence_score,
+            confidence_score=float(confidence_score),
             language=language,
             sources=source_docs,
             warning=warning
@@ -0,0 +1,141 @@
+"""
+PDF text extraction and chunking for Nepali Law Bot
+Runs inside ingestion worker processes, so it must stay free of torch,
+the embedding models and the database clients
+"""
+import os
+import re
+import gzip
+import hashlib
+import logging
+from typing import List, Tuple
+import pdfplumber
+import pymupdf
+
+from .config import CHUNK_MIN_LENGTH, PDF_EXTRACTOR, PDF_CACHE_DIR
+
+# Same logger as utils.logger, without importing the rest of utils
+logger = logging.getLogger("nepali_law_bot")
+
+# Lines starting a new section (दफा) mark chunk boundaries
+_RE_SECTION_HEADER = re.compile(r"^दफा\s*\d+", re.MULTILINE)
+
+
+def detect_doc_type(path: str) -> Tuple[str, int]:
+    """
+    Detect document type and priority from file path
+    
+    Args:
+        path: File path
+        
+    Returns:
+        Tuple of (doc_type, priority)
+    """
+    p = path.lower()
+    if "संविधान" in p:
+        return "constitution", 1
+    if "मुलुकी" in p:
+        return "muluki_act", 2
+    if "नियम" in p or "विनियम" in p:
+        return "rule", 4
+    return "act", 3
+
+
+def chunk_text(text: str) -> List[str]:
+    """
+    Split text into chunks by section (दफा)
+    
+    Args:
+        text: Full document text
+        
+    Returns:
+        List of text chunks
+    """
+    # Chunk boundaries: document start plus every line starting with दफा
+    bounds = [0]
+    bounds.extend(m.start() for m in _RE_SECTION_HEADER.finditer(text) if m.start())
+    bounds.append(len(text))
+    
+    chunks = []
+    for start, end in zip(bounds, bounds[1:]):
+        chunk = text[start:end].strip()
+        if len(chunk) > CHUNK_MIN_LENGTH:
+            chunks.append(chunk)
+    return chunks
+
+
+def extract_pdf(pdf_path: str, extractor: str = PDF_EXTRACTOR) -> Tuple[str, List[str], str, int]:
+    """
+    Extract and chunk a single PDF (runs in a worker process)
+    
+    Args:
+        pdf_path: Path to the PDF file
+        extractor: PDF text extractor ('pymupdf' or 'pdfplumber')
+        
+    Returns:
+        Tuple of (pdf_path, chunks, doc_type, priority)
+    """
+    doc_type, priority = detect_doc_type(pdf_path)
+    full_text = _cached_extract(pdf_path, extractor)
+    
+    return pdf_path, chunk_text(full_text), doc_type, priority
+
+
+def _read_pdf_text(pdf_path: str, extractor: str) -> str:
+    """
+    Extract the full text of a PDF
+    
+    MuPDF is much faster than pdfplumber; pdfplumber is kept as a fallback
+    for files where MuPDF finds no text.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        extractor: PDF text extractor ('pymupdf' or 'pdfplumber')
+        
+    Returns:
+        Full document text
+    """
+    if extractor == "pymupdf":
+        with pymupdf.open(pdf_path) as doc:
+            full_text = "\n".join(page.get_text("text") for page in doc)
+        if full_text.strip():
+            return full_text
+        logger.info(f"MuPDF found no text, falling back to pdfplumber: {pdf_path}")
+    
+    with pdfplumber.open(pdf_path) as pdf:
+        return "\n".join(
+            page.extract_text() or "" for page in pdf.pages
+        )
+
+
+def _cached_extract(pdf_path: str, extractor: str = PDF_EXTRACTOR) -> str:
+    """
+    Extract text from a PDF, reusing a compressed on-disk copy if unchanged
+    
+    Args:
+        pdf_path: Path to the PDF file
+        extractor: PDF text extractor ('pymupdf' or 'pdfplumber')
+        
+    Returns:
+        Full document text
+    """
+    stat = os.stat(pdf_path)
+    key = hashlib.sha1(
+        f"{os.path.abspath(pdf_path)}:{stat.st_mtime}:{stat.st_size}:{extractor}".encode("utf-8")
+    ).hexdigest()
+    cache_path = os.path.join(PDF_CACHE_DIR, f"{key}.txt.gz")
+    
+    if os.path.exists(cache_path):
+        with gzip.open(cache_path, "rt", encoding="utf-8") as f:
+            return f.read()
+    
+    full_text = _read_pdf_text(pdf_path, extractor)
+    
+    # Write to a temporary file first so parallel workers never read partial files
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=1) as f:
+        f.write(full_text)
+    os.replace(tmp_path, cache_path)
+    
+    return full_text
@@ -2,21 +2,115 @@
 Context retrieval module with confidence scoring
 Handles hierarchical legal document retrieval from Qdrant
 """
-from typing import List, Dict, Any
+import itertools
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from operator import itemgetter
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 import numpy as np
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 from pymongo import MongoClient
-from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue
-from sentence_transformers import SentenceTransformer
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import Filter, FieldCondition, MatchValue, QueryRequest, SearchParams
+from sentence_transformers import CrossEncoder
 
 from .config import (
     MONGO_URI, MONGO_DB_NAME, MONGO_COLLECTION_NAME,
     QDRANT_URL, QDRANT_API_KEY, QDRANT_COLLECTION_NAME,
-    EMBEDDING_MODEL_NAME, MAX_CONTEXT_CHARS,
+    QDRANT_PREFER_GRPC, QDRANT_GRPC_PORT,
+    MAX_CONTEXT_CHARS, EMBEDDING_QUERY_PROMPT,
     CONSTITUTION_LIMIT, MULUKI_ACT_LIMIT, ACT_LIMIT, RULE_LIMIT,
-    MIN_SIMILARITY_SCORE
+    MIN_SIMILARITY_SCORE, RERANK_TOP_K, QUERY_EMBEDDING_CACHE_SIZE,
+    METADATA_CACHE_SIZE, HNSW_EF
 )
-from .utils import logger
+from .models import get_embedding_model, get_reranker_model
+from .utils import logger, extract_legal_references
+
+# Hierarchical search order: Constitution → Muluki Act → Act
+HIERARCHY_SEARCHES = [
+    ("constitution", CONSTITUTION_LIMIT),
+    ("muluki_act", MULUKI_ACT_LIMIT),
+    ("act", ACT_LIMIT)
+]
+
+
+# Harmonic numbers H(n) = 1 + 1/2 + ... + 1/n, the confidence weight sums
+_HARMONIC = [0.0] + list(itertools.accumulate(1.0 / i for i in range(1, 64)))
+
+# Boosts for documents whose structure matches a reference in the query
+_STRUCTURE_BOOSTS = [
+    ("दफा", "sections", 1.3),       # 30% boost for exact section match
+    ("परिच्छेद", "chapters", 1.2),  # 20% boost for chapter match
+    ("भाग", "parts", 1.15)          # 15% boost for part match
+]
+
+# Boosts by document priority (Constitution > Muluki Act > Act > Rule)
+_PRIORITY_BOOSTS = {1: 1.1, 2: 1.05}
+
+# Qdrant payload filter for each searched document type, built once
+_DOC_TYPE_FILTERS = {
+    doc_type: Filter(
+        must=[
+            FieldCondition(
+                key="doc_type",
+                match=MatchValue(value=doc_type)
+            )
+        ]
+    )
+    for doc_type in [name for name, _ in HIERARCHY_SEARCHES] + ["rule"]
+}
+
+# Context budget below which no further document block is started
+_MIN_BLOCK_SIZE = 64
+
+# Metadata fields not needed for ranking, context building or display
+_META_PROJECTION = {"_id": False, "chunk_hash": False, "file_path": False}
+
+
+@lru_cache(maxsize=1)
+def _get_mongo_client() -> MongoClient:
+    """MongoDB client shared by every ContextRetrieval in the process (pymongo pools connections)"""
+    return MongoClient(MONGO_URI)
+
+
+@lru_cache(maxsize=1)
+def _get_qdrant_client() -> QdrantClient:
+    """Qdrant client shared by every ContextRetrieval in the process"""
+    # gRPC avoids JSON serialization on every search
+    return QdrantClient(
+        url=QDRANT_URL, api_key=QDRANT_API_KEY,
+        prefer_grpc=QDRANT_PREFER_GRPC, grpc_port=QDRANT_GRPC_PORT
+    )
+
+
+@lru_cache(maxsize=None)
+def _search_params(limit: int) -> SearchParams:
+    """HNSW beam scaled with the result limit (only a handful of limits are used)"""
+    return SearchParams(hnsw_ef=max(HNSW_EF, 2 * limit))
+
+
+@lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+def _encode_query_cached(query: str) -> np.ndarray:
+    """
+    Encode a normalized query with the shared embedding model (memoized)
+    
+    Args:
+        query: Whitespace-normalized query
+        
+    Returns:
+        Read-only L2-normalized query embedding
+    """
+    embedding = get_embedding_model().encode(
+        query,
+        prompt=EMBEDDING_QUERY_PROMPT,
+        batch_size=1,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    )
+    # Cached arrays are shared between callers
+    embedding.setflags(write=False)
+    return embedding
 
 
 class ContextRetrieval:
@@ -27,19 +121,43 @@ class ContextRetrieval:
         logger.info("Initializing Context Retrieval...")
         
         # MongoDB setup
-        self.mongo_client = MongoClient(MONGO_URI)
+        self.mongo_client = _get_mongo_client()
         self.db = self.mongo_client[MONGO_DB_NAME]
         self.meta_col = self.db[MONGO_COLLECTION_NAME]
         
-        # Qdrant setup
-        self.qdrant = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+        # Qdrant setup (sync client shared across instances; the async one binds to an event loop)
+        self.qdrant = _get_qdrant_client()
+        self.async_qdrant = AsyncQdrantClient(
+            url=QDRANT_URL, api_key=QDRANT_API_KEY,
+            prefer_grpc=QDRANT_PREFER_GRPC, grpc_port=QDRANT_GRPC_PORT
+        )
+        
+        # Recently fetched metadata documents keyed by qdrant_id
+        self._meta_cache: OrderedDict = OrderedDict()
+        # Shared by threadpool (streaming) and event-loop requests in server mode
+        self._meta_cache_lock = threading.Lock()
         
-        # Load embedding model
-        logger.info(f"Loading embedding model: {EMBEDDING_MODEL_NAME}")
-        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        # Async MongoDB client, created on first use so it binds to the running event loop
+        self._async_meta_col = None
+        
+        # Load embedding model (shared across instances)
+        self.embedding_model = get_embedding_model()
         
         logger.info("Context Retrieval initialized successfully")
     
+    @property
+    def async_meta_col(self) -> AsyncIOMotorCollection:
+        """Metadata collection on the async (motor) MongoDB client"""
+        if self._async_meta_col is None:
+            client = AsyncIOMotorClient(MONGO_URI)
+            self._async_meta_col = client[MONGO_DB_NAME][MONGO_COLLECTION_NAME]
+        return self._async_meta_col
+    
+    @property
+    def reranker(self) -> CrossEncoder:
+        """Cross-encoder reranker, loaded on first use"""
+        return get_reranker_model()
+    
     def calculate_confidence_score(self, documents: List[Dict[str, Any]]) -> float:
         """
         Calculate overall confidence score based on retrieved documents
@@ -59,11 +177,11 @@ class ContextRetrieval:
         if not scores:
             return 0.0
         
-        # Calculate weighted average (higher weight for top results)
-        weights = np.array([1.0 / (i + 1) for i in range(len(scores))])
-        weights = weights / weights.sum()
-        
-        confidence = np.average(scores, weights=weights)
+        # Weighted average with weights 1/(i+1) (higher weight for top results);
+        # plain Python beats numpy dispatch for a handful of scores
+        n = len(scores)
+        weight_sum = _HARMONIC[n] if n < len(_HARMONIC) else sum(1.0 / i for i in range(1, n + 1))
+        confidence = sum(s / (i + 1) for i, s in enumerate(scores)) / weight_sum
         
         # Penalize if top score is too low
         if scores[0] < MIN_SIMILARITY_SCORE:
@@ -75,7 +193,193 @@ class ContextRetrieval:
         
         return float(confidence)
     
-    def retrieve_context(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def encode_query(self, query: str) -> np.ndarray:
+        """
+        Encode a query into a normalized embedding
+        
+        Args:
+            query: User query
+            
+        Returns:
+            L2-normalized query embedding (read-only, may be shared)
+        """
+        # Whitespace differences don't change the meaning, so share a cache key
+        return _encode_query_cached(" ".join(query.split()))
+    
+    @staticmethod
+    def _search_request(
+        query_vec: List[float],
+        doc_type: str,
+        limit: int
+    ) -> QueryRequest:
+        """
+        Build a Qdrant query request for one document type
+        
+        Args:
+            query_vec: Query embedding
+            doc_type: Document type to filter on
+            limit: Maximum number of hits
+            
+        Returns:
+            QueryRequest for query_batch_points
+        """
+        return QueryRequest(
+            query=query_vec,
+            limit=limit,
+            with_payload=True,
+            params=_search_params(limit),
+            filter=_DOC_TYPE_FILTERS[doc_type]
+        )
+    
+    def _search_requests(self, query_vec: List[float], limit: Optional[int]) -> List[QueryRequest]:
+        """
+        Build the hierarchy searches followed by the rule search
+        
+        Args:
+            query_vec: Query embedding
+            limit: Per-search result limit overriding the configured limits
+            
+        Returns:
+            Query requests in hierarchy order, rules last
+        """
+        return [
+            self._search_request(query_vec, doc_type, limit or type_limit)
+            for doc_type, type_limit in HIERARCHY_SEARCHES
+        ] + [self._search_request(query_vec, "rule", limit or RULE_LIMIT)]
+    
+    @staticmethod
+    def _select_points(results: List[Any]) -> List[Any]:
+        """
+        Apply the legal hierarchy to batched search results
+        
+        Args:
+            results: Query responses in the order of _search_requests
+            
+        Returns:
+            Hits from the highest authority found, followed by rule hits
+        """
+        *hierarchy, rules = results
+        
+        points = []
+        for hits in hierarchy:
+            if hits.points:
+                points.extend(hits.points)
+                # Stop at highest authority found
+                break
+        
+        # ALWAYS append Rules & Regulations (for procedural guidance)
+        points.extend(rules.points)
+        
+        return points
+    
+    def _attach_metadata(self, points: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Fetch MongoDB metadata for Qdrant hits
+        
+        Args:
+            points: Scored Qdrant points
+            
+        Returns:
+            Metadata documents with similarity scores
+        """
+        if not points:
+            return []
+        
+        meta_by_id = self._get_meta_many([p.id for p in points])
+        return self._merge_metadata(points, meta_by_id)
+    
+    async def _aattach_metadata(self, points: List[Any]) -> List[Dict[str, Any]]:
+        """Async version of _attach_metadata using the motor client"""
+        if not points:
+            return []
+        
+        meta_by_id = await self._aget_meta_many([p.id for p in points])
+        return self._merge_metadata(points, meta_by_id)
+    
+    def _get_meta_many(self, ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        """
+        Fetch metadata documents by Qdrant id, serving repeat ids from the LRU cache
+        
+        Args:
+            ids: Qdrant point ids
+            
+        Returns:
+            Metadata documents keyed by Qdrant id
+        """
+        meta_by_id, missing = self._cached_metadata(ids)
+        if missing:
+            # One MongoDB round trip for the uncached hits (qdrant_id is indexed at ingestion)
+            cursor = self.meta_col.find(
+                {"qdrant_id": {"$in": missing}},
+                projection=_META_PROJECTION
+            )
+            meta_by_id.update(self._cache_metadata(cursor))
+        return meta_by_id
+    
+    async def _aget_meta_many(self, ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        """Async version of _get_meta_many using the motor client"""
+        meta_by_id, missing = self._cached_metadata(ids)
+        if missing:
+            cursor = self.async_meta_col.find(
+                {"qdrant_id": {"$in": missing}},
+                projection=_META_PROJECTION
+            )
+            meta_by_id.update(self._cache_metadata(await cursor.to_list(length=None)))
+        return meta_by_id
+    
+    def _cached_metadata(self, ids: List[Any]) -> Tuple[Dict[Any, Dict[str, Any]], List[Any]]:
+        """Split ids into cached metadata and ids that still need a MongoDB lookup"""
+        found = {}
+        missing = []
+        with self._meta_cache_lock:
+            for qdrant_id in ids:
+                meta = self._meta_cache.get(qdrant_id)
+                if meta is None:
+                    missing.append(qdrant_id)
+                else:
+                    self._meta_cache.move_to_end(qdrant_id)
+                    found[qdrant_id] = meta
+        return found, missing
+    
+    def _cache_metadata(self, metas: Iterable[Dict[str, Any]]) -> Dict[Any, Dict[str, Any]]:
+        """Add metadata documents to the LRU cache, evicting the least recently used"""
+        # Drain the cursor before taking the lock
+        fetched = {m["qdrant_id"]: m for m in metas}
+        with self._meta_cache_lock:
+            self._meta_cache.update(fetched)
+            while len(self._meta_cache) > METADATA_CACHE_SIZE:
+                self._meta_cache.popitem(last=False)
+        return fetched
+    
+    @staticmethod
+    def _merge_metadata(
+        points: List[Any],
+        meta_by_id: Dict[Any, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Pair metadata documents with their Qdrant hits, keeping hit order"""
+        docs = []
+        for p in points:
+            meta = meta_by_id.get(p.id)
+            if meta:
+                # Copy so scoring never mutates the cached document
+                doc = dict(meta)
+                doc["similarity_score"] = p.score
+                docs.append(doc)
+        return docs
+    
+    def _prepare_query_vec(self, query: str, query_vec: Optional[List[float]]) -> List[float]:
+        """Encode the query unless an embedding was supplied"""
+        if query_vec is None:
+            query_vec = self.encode_query(query)
+        return np.asarray(query_vec).tolist()
+    
+    def retrieve_context(
+        self,
+        query: str,
+        k: int = 5,
+        query_vec: Optional[List[float]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
         Retrieve relevant legal context with hierarchical search
         
@@ -88,78 +392,100 @@ class ContextRetrieval:
         Args:
             query: User query
             k: Number of documents to retrieve
+            query_vec: Precomputed query embedding (encoded from query if None)
+            limit: Per-search result limit overriding the configured limits
             
         Returns:
             List of documents with metadata and similarity scores
         """
-        # Generate query embedding
-        query_vec = self.embedding_model.encode("query: " + query).tolist()
-        
-        final_docs = []
-        
-        # 1️⃣ Search in hierarchy: Constitution → Muluki Act → Act
-        for doc_type, limit in [
-            ("constitution", CONSTITUTION_LIMIT),
-            ("muluki_act", MULUKI_ACT_LIMIT),
-            ("act", ACT_LIMIT)
-        ]:
-            hits = self.qdrant.query_points(
-                collection_name=QDRANT_COLLECTION_NAME,
-                query=query_vec,
-                limit=limit,
-                with_payload=True,
-                query_filter=Filter(
-                    must=[
-                        FieldCondition(
-                            key="doc_type",
-                            match=MatchValue(value=doc_type)
-                        )
-                    ]
-                )
-            )
+        query_vec = self._prepare_query_vec(query, query_vec)
+        
+        # All hierarchy levels and rules in a single Qdrant round trip
+        results = self.qdrant.query_batch_points(
+            collection_name=QDRANT_COLLECTION_NAME,
+            requests=self._search_requests(query_vec, limit)
+        )
+        points = self._select_points(results)
+        
+        # Get metadata from MongoDB
+        final_docs = self._attach_metadata(points)
+        
+        logger.info(f"Retrieved {len(final_docs)} documents for query")
+        
+        return final_docs
+    
+    async def aretrieve_context(
+        self,
+        query: str,
+        query_vec: Optional[List[float]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Async version of retrieve_context using the async Qdrant and MongoDB clients
+        
+        Args:
+            query: User query
+            query_vec: Precomputed query embedding (encoded from query if None)
+            limit: Per-search result limit overriding the configured limits
             
-            if hits.points:
-                for p in hits.points:
-                    # Get metadata from MongoDB
-                    meta = self.meta_col.find_one({"qdrant_id": p.id})
-                    if meta:
-                        # Add similarity score
-                        meta["similarity_score"] = p.score
-                        final_docs.append(meta)
-                
-                # Stop at highest authority found
-                break
+        Returns:
+            List of documents with metadata and similarity scores
+        """
+        query_vec = self._prepare_query_vec(query, query_vec)
         
-        # 2️⃣ ALWAYS append Rules & Regulations (for procedural guidance)
-        rule_hits = self.qdrant.query_points(
+        results = await self.async_qdrant.query_batch_points(
             collection_name=QDRANT_COLLECTION_NAME,
-            query=query_vec,
-            limit=RULE_LIMIT,
-            with_payload=True,
-            query_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key="doc_type",
-                        match=MatchValue(value="rule")
-                    )
-                ]
-            )
+            requests=self._search_requests(query_vec, limit)
         )
+        points = self._select_points(results)
         
-        for p in rule_hits.points:
-            meta = self.meta_col.find_one({"qdrant_id": p.id})
-            if meta:
-                meta["similarity_score"] = p.score
-                final_docs.append(meta)
+        # Get metadata from MongoDB without blocking the event loop
+        final_docs = await self._aattach_metadata(points)
         
         logger.info(f"Retrieved {len(final_docs)} documents for query")
         
         return final_docs
     
+    def rerank_cross_encoder(
+        self,
+        query: str,
+        docs: List[Dict[str, Any]],
+        top_k: int = RERANK_TOP_K
+    ) -> List[Dict[str, Any]]:
+        """
+        Rerank documents with a cross-encoder and keep the best matches
+        
+        Args:
+            query: User query
+            docs: List of candidate documents
+            top_k: Number of documents to keep
+            
+        Returns:
+            Top documents ordered by cross-encoder score
+        """
+        if not docs:
+            return docs
+        
+        pairs = [(query, d["text"]) for d in docs]
+        scores = self.reranker.predict(pairs, batch_size=16, show_progress_bar=False)
+        
+        for doc, score in zip(docs, scores):
+            doc["rerank_score"] = float(score)
+        
+        reranked = sorted(docs, key=lambda x: x["rerank_score"], reverse=True)[:top_k]
+        
+        logger.info(f"Cross-encoder reranked {len(docs)} -> {len(reranked)} documents")
+        
+        return reranked
+    
     def rerank_by_metadata(self, docs: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
         """
         Rerank documents based on metadata matches with query
         
+        Documents scored by rerank_cross_encoder keep the cross-encoder order,
+        with the metadata boost applied to their rerank score; otherwise the
+        boosted similarity score decides the order.
+        
         Args:
             docs: List of documents with metadata
             query: User query
@@ -167,49 +493,41 @@ class ContextRetrieval:
         Returns:
             Reranked list of documents
         """
-        from .utils import extract_legal_references
-        
         # Extract legal references from query
         query_refs = extract_legal_references(query)
         
+        # (metadata field, reference key, boost) for each structural match
+        structure_boosts = [
+            (field, query_refs[ref_key], boost)
+            for field, ref_key, boost in _STRUCTURE_BOOSTS
+            if query_refs[ref_key]
+        ]
+        
         # Rerank documents
         for doc in docs:
             boost_factor = 1.0
             
-            # Boost if section matches
-            doc_section = doc.get("दफा", "")
-            if doc_section:
-                section_num = doc_section.replace("दफा", "").strip()
-                if section_num in query_refs["sections"]:
-                    boost_factor *= 1.3  # 30% boost for exact section match
-            
-            # Boost if chapter matches
-            doc_chapter = doc.get("परिच्छेद", "")
-            if doc_chapter:
-                chapter_num = doc_chapter.replace("परिच्छेद", "").strip()
-                if chapter_num in query_refs["chapters"]:
-                    boost_factor *= 1.2  # 20% boost for chapter match
-            
-            # Boost if part matches
-            doc_part = doc.get("भाग", "")
-            if doc_part:
-                part_num = doc_part.replace("भाग", "").strip()
-                if part_num in query_refs["parts"]:
-                    boost_factor *= 1.15  # 15% boost for part match
+            # Boost if section / chapter / part matches (skipped when the query has no references)
+            for field, refs, boost in structure_boosts:
+                value = doc.get(field)
+                if value and value.replace(field, "").strip() in refs:
+                    boost_factor *= boost
             
             # Boost based on document priority (Constitution > Muluki > Act > Rule)
-            priority = doc.get("priority", 4)
-            if priority == 1:  # Constitution
-                boost_factor *= 1.1
-            elif priority == 2:  # Muluki Act
-                boost_factor *= 1.05
+            boost_factor *= _PRIORITY_BOOSTS.get(doc.get("priority", 4), 1.0)
             
             # Apply boost to similarity score
             doc["similarity_score"] = doc.get("similarity_score", 0.0) * boost_factor
             doc["metadata_boost"] = boost_factor
         
-        # Sort by boosted similarity score
-        reranked = sorted(docs, key=lambda x: x.get("similarity_score", 0.0), reverse=True)
+        # Sort by boosted cross-encoder score when available (sigmoid scores are
+        # positive, so the boost only ever promotes), else by boosted similarity
+        if docs and "rerank_score" in docs[0]:
+            reranked = sorted(
+                docs, key=lambda d: d["rerank_score"] * d["metadata_boost"], reverse=True
+            )
+        else:
+            reranked = sorted(docs, key=itemgetter("similarity_score"), reverse=True)
         
         logger.info(f"Reranked {len(docs)} documents using metadata")
         
@@ -226,10 +544,15 @@ class ContextRetrieval:
         Returns:
             Formatted context string
         """
-        context_blocks = []
-        total_chars = 0
+        context_blocks: List[str] = []
+        blocks_append = context_blocks.append
+        remaining = max_chars
         
         for d in docs:
+            # Nothing useful fits in what is left of the budget
+            if remaining < _MIN_BLOCK_SIZE:
+                break
+            
             # Build header with legal structure
             header = (
                 f"Law Type: {d['doc_type']}\n"
@@ -238,14 +561,22 @@ class ContextRetrieval:
             )
             
             body = d["text"]
-            block = header + body + "\n\n"
+            header_len = len(header)
+            needed = header_len + len(body) + 2
             
-            # Check if adding this block exceeds limit
-            if total_chars + len(block) > max_chars:
-                break
+            if needed <= remaining:
+                blocks_append(header)
+                blocks_append(body)
+                blocks_append("\n\n")
+                remaining -= needed
+                continue
             
-            context_blocks.append(block)
-            total_chars += len(block)
+            # Fill the rest of the budget with the start of this document
+            if remaining > header_len + 50:
+                blocks_append(header)
+                blocks_append(body[:remaining - header_len - 2])
+                blocks_append("\n\n")
+            break
         
         return "".join(context_blocks)
     
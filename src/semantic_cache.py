@@ -0,0 +1,141 @@
+"""
+Semantic response cache for Nepali Law Bot
+Returns a previous response when a new query is a close paraphrase of a cached one
+"""
+import time
+import threading
+from typing import Any, Hashable, List, Optional
+import numpy as np
+
+from .config import (
+    SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_MAX_ENTRIES
+)
+from .utils import logger
+
+
+class SemanticCache:
+    """
+    In-process cache keyed on L2-normalized query embeddings
+
+    Each entry also carries an exact-match key; a lookup only considers
+    entries stored under the same key, so near-identical queries that must
+    not share an answer (different language, different section number)
+    never hit each other. Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES
+    ):
+        """
+        Initialize an empty cache
+
+        Args:
+            threshold: Minimum cosine similarity for a cache hit
+            ttl: Seconds before a cached entry expires
+            max_entries: Maximum number of cached responses
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._vectors: Optional[np.ndarray] = None
+        self._keys: List[Hashable] = []
+        self._responses: List[Any] = []
+        self._timestamps: List[float] = []
+
+        # Guards the parallel entry lists (server mode shares one cache across threads)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    @property
+    def hit_ratio(self) -> float:
+        """Fraction of lookups served from the cache"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _evict_expired(self) -> None:
+        """Drop entries older than the TTL (caller holds the lock)"""
+        if not self._responses:
+            return
+
+        now = time.time()
+        keep = [i for i, ts in enumerate(self._timestamps) if now - ts < self.ttl]
+        if len(keep) == len(self._responses):
+            return
+
+        self._keys = [self._keys[i] for i in keep]
+        self._responses = [self._responses[i] for i in keep]
+        self._timestamps = [self._timestamps[i] for i in keep]
+        self._vectors = self._vectors[keep] if keep else None
+
+    def lookup(self, embedding: np.ndarray, key: Hashable = None) -> Optional[Any]:
+        """
+        Find a cached response for a semantically similar query
+
+        Args:
+            embedding: L2-normalized query embedding
+            key: Exact-match key the entry must have been stored under
+
+        Returns:
+            Cached response, or None on a miss
+        """
+        with self._lock:
+            self._evict_expired()
+
+            response = None
+            candidates = [i for i, entry_key in enumerate(self._keys) if entry_key == key]
+            if candidates:
+                # Dot product of normalized vectors is cosine similarity
+                similarities = self._vectors[candidates] @ np.asarray(embedding, dtype=np.float32)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    response = self._responses[candidates[best]]
+
+            if response is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            entries = len(self._responses)
+
+        logger.info(
+            f"Semantic cache {'hit' if response is not None else 'miss'} "
+            f"(hit ratio: {self.hit_ratio:.2f}, entries: {entries})"
+        )
+
+        return response
+
+    def put(self, embedding: np.ndarray, response: Any, key: Hashable = None) -> None:
+        """
+        Store a response for a query embedding
+
+        Args:
+            embedding: L2-normalized query embedding
+            response: Response to cache
+            key: Exact-match key later lookups must supply
+        """
+        vector = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = vector
+            else:
+                self._vectors = np.vstack([self._vectors, vector])
+            self._keys.append(key)
+            self._responses.append(response)
+            self._timestamps.append(time.time())
+
+            # Drop the oldest entries once the cache is full
+            overflow = len(self._responses) - self.max_entries
+            if overflow > 0:
+                self._vectors = self._vectors[overflow:]
+                self._keys = self._keys[overflow:]
+                self._responses = self._responses[overflow:]
+                self._timestamps = self._timestamps[overflow:]
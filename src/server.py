@@ -0,0 +1,54 @@
+"""
+HTTP server for Nepali Law Bot
+Keeps models and database clients loaded across queries from many clients
+"""
+import json
+from typing import Iterator
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from .chatbot import NepaliLawBot
+from .output_parser import LegalResponse
+from .config import SERVER_HOST, SERVER_PORT
+
+
+class QueryIn(BaseModel):
+    """Request body for query endpoints"""
+    text: str
+
+
+app = FastAPI(title="Nepali Law Bot")
+
+# Loaded once at process start and shared by all requests
+bot = NepaliLawBot()
+
+
+@app.post("/query", response_model=LegalResponse)
+async def query(q: QueryIn) -> LegalResponse:
+    """Answer a legal query"""
+    return await bot.aquery(q.text)
+
+
+@app.post("/stream")
+def stream(q: QueryIn) -> StreamingResponse:
+    """
+    Answer a legal query as newline-delimited JSON
+
+    Emits {"token": ...} lines while the answer is generated, then a
+    final {"response": ...} line with the full LegalResponse.
+    """
+    def events() -> Iterator[str]:
+        for item in bot.query_stream(q.text):
+            if isinstance(item, LegalResponse):
+                event = {"response": item.model_dump()}
+            else:
+                event = {"token": item}
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
@@ -1,12 +1,31 @@
 """
 Utility functions for Nepali Law Bot
 """
+import io
+import os
+import re
+import sys
 import logging
-from typing import Optional
-from colorama import Fore, Style, init
+from typing import Callable, Dict, FrozenSet, Iterator, Optional, Union
 
-# Initialize colorama for Windows
-init(autoreset=True)
+from .output_parser import LegalResponse
+
+# Windows consoles need ANSI escape processing switched on; colorama only
+# wraps stdout on versions older than Windows 10
+if os.name == "nt":
+    from colorama import just_fix_windows_console
+    just_fix_windows_console()
+
+# Legal references in Nepali or English, e.g. "दफा 17", "chapter 3", "(2)"
+_LEGAL_REF_RE = re.compile(
+    r"(?:दफा|धारा|(?i:section))\s*(?P<sections>\d+)"
+    r"|(?:परिच्छेद|(?i:chapter))\s*(?P<chapters>\d+)"
+    r"|(?:भाग|(?i:part))\s*(?P<parts>\d+)"
+    r"|\((?P<subsections>\d+)\)"
+)
+
+# Every legal reference contains a number, so digit-free text has none
+_DIGIT_RE = re.compile(r"\d")
 
 def setup_logging(level: int = logging.WARNING) -> logging.Logger:
     """
@@ -25,6 +44,30 @@ def setup_logging(level: int = logging.WARNING) -> logging.Logger:
     )
     return logging.getLogger("nepali_law_bot")
 
+_COLOR_MAP = {
+    "red": "\x1b[31m",
+    "green": "\x1b[32m",
+    "yellow": "\x1b[33m",
+    "blue": "\x1b[34m",
+    "magenta": "\x1b[35m",
+    "cyan": "\x1b[36m",
+    "white": "\x1b[37m"
+}
+_RESET = "\x1b[0m"
+
+def colorize(text: str, color: str = "white") -> str:
+    """
+    Wrap text in color escape codes
+    
+    Args:
+        text: Text to color
+        color: Color name (red, green, yellow, blue, magenta, cyan, white)
+        
+    Returns:
+        Colored text
+    """
+    return f"{_COLOR_MAP.get(color, _COLOR_MAP['white'])}{text}{_RESET}"
+
 def print_colored(text: str, color: str = "white") -> None:
     """
     Print colored text to console
@@ -33,17 +76,38 @@ def print_colored(text: str, color: str = "white") -> None:
         text: Text to print
         color: Color name (red, green, yellow, blue, magenta, cyan, white)
     """
-    color_map = {
-        "red": Fore.RED,
-        "green": Fore.GREEN,
-        "yellow": Fore.YELLOW,
-        "blue": Fore.BLUE,
-        "magenta": Fore.MAGENTA,
-        "cyan": Fore.CYAN,
-        "white": Fore.WHITE
-    }
+    sys.stdout.write(f"{_COLOR_MAP.get(color, _COLOR_MAP['white'])}{text}{_RESET}\n")
+
+class ColorBuffer:
+    """Collects console output and writes it to stdout in a single call"""
+    
+    def __init__(self):
+        """Initialize an empty buffer"""
+        self._buffer = io.StringIO()
     
-    print(f"{color_map.get(color, Fore.WHITE)}{text}{Style.RESET_ALL}")
+    def __enter__(self) -> "ColorBuffer":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.flush()
+    
+    def print(self, text: str = "") -> None:
+        """Buffer a line of plain text"""
+        self._buffer.write(f"{text}\n")
+    
+    def print_colored(self, text: str, color: str = "white") -> None:
+        """Buffer a line of colored text"""
+        self._buffer.write(f"{colorize(text, color)}\n")
+    
+    def getvalue(self) -> str:
+        """Return the buffered output"""
+        return self._buffer.getvalue()
+    
+    def flush(self) -> None:
+        """Write buffered output to stdout and clear the buffer"""
+        sys.stdout.write(self._buffer.getvalue())
+        sys.stdout.flush()
+        self._buffer = io.StringIO()
 
 def format_confidence(score: float) -> str:
     """
@@ -58,16 +122,16 @@ def format_confidence(score: float) -> str:
     percentage = score * 100
     
     if score >= 0.7:
-        color = Fore.GREEN
+        color = _COLOR_MAP["green"]
         label = "High"
     elif score >= 0.5:
-        color = Fore.YELLOW
+        color = _COLOR_MAP["yellow"]
         label = "Medium"
     else:
-        color = Fore.RED
+        color = _COLOR_MAP["red"]
         label = "Low"
     
-    return f"{color}{label} ({percentage:.1f}%){Style.RESET_ALL}"
+    return f"{color}{label} ({percentage:.1f}%){_RESET}"
 
 def truncate_text(text: str, max_length: int = 100) -> str:
     """
@@ -85,7 +149,7 @@ def truncate_text(text: str, max_length: int = 100) -> str:
     return text[:max_length-3] + "..."
 
 
-def extract_legal_references(text: str) -> dict:
+def extract_legal_references(text: str) -> Dict[str, FrozenSet[str]]:
     """
     Extract legal references from text (section numbers, chapters, parts)
     
@@ -93,58 +157,74 @@ def extract_legal_references(text: str) -> dict:
         text: Text to extract references from
         
     Returns:
-        Dictionary with extracted references
+        Dictionary mapping each reference category to its numbers
     """
-    import re
-    
     references = {
-        "sections": [],      # दफा
-        "chapters": [],      # परिच्छेद
-        "parts": [],         # भाग
-        "subsections": []    # उपदफा
+        "sections": set(),      # दफा
+        "chapters": set(),      # परिच्छेद
+        "parts": set(),         # भाग
+        "subsections": set()    # उपदफा
     }
     
-    # Extract sections (दफा)
-    section_patterns = [
-        r"दफा\s*(\d+)",
-        r"section\s*(\d+)",
-        r"धारा\s*(\d+)"
-    ]
-    for pattern in section_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        references["sections"].extend(matches)
-    
-    # Extract chapters (परिच्छेद)
-    chapter_patterns = [
-        r"परिच्छेद\s*(\d+)",
-        r"chapter\s*(\d+)"
-    ]
-    for pattern in chapter_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        references["chapters"].extend(matches)
-    
-    # Extract parts (भाग)
-    part_patterns = [
-        r"भाग\s*(\d+)",
-        r"part\s*(\d+)"
-    ]
-    for pattern in part_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        references["parts"].extend(matches)
-    
-    # Extract subsections (उपदफा)
-    subsection_patterns = [
-        r"\((\d+)\)",
-        r"उपदफा\s*\((\d+)\)"
-    ]
-    for pattern in subsection_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        references["subsections"].extend(matches)
-    
-    # Remove duplicates
-    for key in references:
-        references[key] = list(set(references[key]))
-    
-    return references
+    if not _DIGIT_RE.search(text):
+        return {key: frozenset() for key in references}
+    
+    # Single pass; the named group that matched is the reference category
+    for match in _LEGAL_REF_RE.finditer(text):
+        references[match.lastgroup].add(match.group(match.lastgroup))
+    
+    return {key: frozenset(values) for key, values in references.items()}
+
+def run_chat(query_stream: Callable[[str], Iterator[Union[str, LegalResponse]]]) -> None:
+    """
+    Run the interactive chat loop
+    
+    Args:
+        query_stream: Callable yielding answer tokens and then a LegalResponse
+    """
+    print("\n" + "=" * 80)
+    print("🏛️  NEPALI LAW BOT - Legal Assistant for Nepali Law")
+    print("=" * 80)
+    print("\nType your legal question in English or Nepali.")
+    print("Type 'quit' or 'exit' to end the session.\n")
+    
+    while True:
+        try:
+            # Get user input
+            user_input = input("\n💬 You: ").strip()
+            
+            # Check for exit commands
+            if user_input.lower() in ["quit", "exit", "bye"]:
+                print("\n👋 Thank you for using Nepali Law Bot. Goodbye!\n")
+                break
+            
+            # Skip empty input
+            if not user_input:
+                continue
+            
+            # Process query
+            print("\n🔍 Searching legal documents...")
+            print("\n📝 ANSWER:")
+            print("-" * 80)
+            
+            # Print answer tokens as they arrive
+            response = None
+            for item in query_stream(user_input):
+                if isinstance(item, LegalResponse):
+                    response = item
+                else:
+                    print(item, end="", flush=True)
+            print()
+            
+            # Display the rest of the formatted response
+            print("\n" + response.format_for_display(include_answer=False))
+            
+        except KeyboardInterrupt:
+            print("\n\n👋 Session interrupted. Goodbye!\n")
+            break
+        except Exception as e:
+            logger.error(f"Error processing query: {e}")
+            print(f"\n❌ Error: {e}")
+            print("Please try again with a different query.\n")
 
 logger = setup_logging()